@@ -8,14 +8,18 @@ This module implements the Downloader Middleware Manager
 """
 
 import asyncio
+import collections.abc
+import functools
 
 from . import middleware
 from .request import Request
 from .response import Response
 
+_Iterable = collections.abc.Iterable
+
 
 def _isiterable(possible_iterator):
-    return hasattr(possible_iterator, '__iter__')
+    return isinstance(possible_iterator, _Iterable)
 
 
 class DownloaderMiddlewareManager(middleware.MiddlewareManager):
@@ -51,62 +55,112 @@ class DownloaderMiddlewareManager(middleware.MiddlewareManager):
 
     This method is called when exceptions occur in :meth:`process_request` and :meth:`process_response`.
 
+A middleware whose methods do heavy synchronous work can set a class
+attribute ``cpu_bound = True``; its methods are then run in the event
+loop's default executor so they don't block the other executers.
+
+A middleware that returns a :class:`~arachnid.request.Request` for a
+URL the engine has already seen (e.g. a retry of the request it was
+given) must construct it with ``dont_filter=True``, otherwise the
+engine's URL dedup drops it.
+
 """
     name = 'downloader middleware'
 
+    def __init__(self, *middlewares):
+        self._cpu_bound_methods = set()
+        super().__init__(*middlewares)
+        self._rebuild_method_cache()
+
     def _add_middleware(self, mw):
         super()._add_middleware(mw)
         if hasattr(mw, 'process_request'):
             self.methods['process_request'].append(mw.process_request)
         if hasattr(mw, 'process_response'):
-            self.methods['process_response'].insert(0, mw.process_response)
+            self.methods['process_response'].append(mw.process_response)
         if hasattr(mw, 'process_exception'):
-            self.methods['process_exception'].insert(0, mw.process_exception)
+            self.methods['process_exception'].append(mw.process_exception)
+        # a middleware that does heavy synchronous work (parsing, hashing,
+        # big regexes) can set cpu_bound = True to be run in an executor
+        # instead of stalling the event loop for every consumer
+        if getattr(mw, 'cpu_bound', False):
+            for name in ('process_request', 'process_response', 'process_exception'):
+                if hasattr(mw, name):
+                    self._cpu_bound_methods.add(getattr(mw, name))
+        self._rebuild_method_cache()
+
+    def _rebuild_method_cache(self):
+        # snapshot the method lists as tuples so download() doesn't pay a
+        # dict lookup per request on the hot path; response/exception
+        # chains run in reverse registration order, which used to be done
+        # with O(n) insert(0, ...) on every registration
+        self._req_methods = tuple(self.methods['process_request'])
+        self._resp_methods = tuple(reversed(self.methods['process_response']))
+        self._exc_methods = tuple(reversed(self.methods['process_exception']))
 
     async def download(self, download_func, request, logger, spider):
-        async def process_request(request):
-            for method in self.methods['process_request']:
-                response = method(request=request, spider=spider)
-                assert response is None or isinstance(response, (Response, Request)), \
-                    'Middleware {}.process_request must return None, Response or Request, got {}'.format(
-                        method.__class__.__name__, response.__class__.__name__)
-
-                if response:
-                    return response
-
-            resp = await download_func(request, logger, spider)
+        try:
+            resp = await self._process_request(download_func, request, logger, spider)
+            resp = await self._process_response(request, resp, spider)
+        except Exception as exc:
+            return await self._process_exception(request, exc, spider)
+        else:
             return resp
 
-        async def process_response(response):
-            assert response is not None, 'Received None in process_response'
-            if isinstance(response, Request):
+    async def _process_request(self, download_func, request, logger, spider):
+        cpu_methods = self._cpu_bound_methods
+        for method in self._req_methods:
+            if method in cpu_methods:
+                response = await asyncio.get_running_loop().run_in_executor(
+                    None, functools.partial(method, request=request, spider=spider))
+            else:
+                response = method(request=request, spider=spider)
+            # exact-type checks: middlewares return Response/Request
+            # themselves, not subclasses, and type() identity skips the
+            # MRO walk isinstance does. The message only gets built when
+            # the assert fires, and python -O drops the whole check
+            assert response is None or type(response) is Response or type(response) is Request, \
+                f'Middleware {method.__class__.__name__}.process_request must ' \
+                f'return None, Response or Request, got {response.__class__.__name__}'
+
+            if response:
                 return response
 
-            for method in self.methods['process_response']:
-                response = method(request=request, response=response, spider=spider)
-                assert response is None or isinstance(response, (Response, Request)), \
-                    'Middleware {}.process_response must return Response or Request, got {}'.format(
-                        method.__class__.__name__, response.__class__.__name__)
+        return await download_func(request, logger, spider)
 
-                if isinstance(response, Request):
-                    return response
+    async def _process_response(self, request, response, spider):
+        assert response is not None, 'Received None in process_response'
+        if type(response) is Request:
             return response
 
-        async def process_exception(_failure):
-            exception = _failure
-            for method in self.methods['process_exception']:
-                result = method(request=request, exception=exception, spider=spider)
-                assert result is None or _isiterable(result), \
-                    'Middleware {} must returns None, or an iterable object, got {}'.format(
-                        method.__class__.__name__, type(result))
-                if result is not None:
-                    return result
-            return _failure
+        cpu_methods = self._cpu_bound_methods
+        for method in self._resp_methods:
+            if method in cpu_methods:
+                response = await asyncio.get_running_loop().run_in_executor(
+                    None, functools.partial(method, request=request,
+                                            response=response, spider=spider))
+            else:
+                response = method(request=request, response=response, spider=spider)
+            assert response is None or type(response) is Response or type(response) is Request, \
+                f'Middleware {method.__class__.__name__}.process_response must ' \
+                f'return Response or Request, got {response.__class__.__name__}'
 
-        try:
-            resp = await process_request(request)
-            resp = await process_response(resp)
-        except Exception as exc:
-            return await process_exception(exc)
-        else:
-            return resp
+            if type(response) is Request:
+                return response
+        return response
+
+    async def _process_exception(self, request, exception, spider):
+        cpu_methods = self._cpu_bound_methods
+        for method in self._exc_methods:
+            if method in cpu_methods:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    None, functools.partial(method, request=request,
+                                            exception=exception, spider=spider))
+            else:
+                result = method(request=request, exception=exception, spider=spider)
+            assert result is None or _isiterable(result), \
+                f'Middleware {method.__class__.__name__} must returns None, ' \
+                f'or an iterable object, got {type(result)}'
+            if result is not None:
+                return result
+        return exception
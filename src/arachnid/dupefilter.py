@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""
+arachnid.dupefilter
+
+This module implements the seen-URL and seen-content stores used by
+the Engine for duplicate detection.
+
+"""
+
+from collections import OrderedDict
+from hashlib import blake2b
+
+from pybloom_live import ScalableBloomFilter
+
+
+class SeenUrls:
+    """ Memory-frugal set of already-enqueued URLs.
+
+    A plain ``set`` of URL strings grows without bound on long crawls,
+    so membership is tracked in a scalable Bloom filter keyed on a
+    16-byte blake2b digest of the (already normalized) URL -- a few
+    bits per URL instead of the full string. An exact LRU of the most
+    recently added digests sits in front of the filter, so the URLs a
+    crawl is most likely to revisit are answered without touching the
+    probabilistic structure.
+
+    The Bloom filter may report a never-seen URL as seen at roughly
+    ``error_rate``; for a crawler that only means the odd page is
+    skipped, which is an acceptable trade for the memory savings.
+    """
+
+    def __init__(self, initial_capacity=10_000_000, error_rate=1e-4,
+                 recent_size=100_000):
+        self._bloom = ScalableBloomFilter(initial_capacity=initial_capacity,
+                                          error_rate=error_rate)
+        self._recent = OrderedDict()
+        self._recent_size = recent_size
+
+    @staticmethod
+    def _digest(url):
+        return blake2b(url.encode(), digest_size=16).digest()
+
+    def __contains__(self, url):
+        digest = self._digest(url)
+        if digest in self._recent:
+            self._recent.move_to_end(digest)
+            return True
+        return digest in self._bloom
+
+    def add(self, url):
+        digest = self._digest(url)
+        self._bloom.add(digest)
+        self._recent[digest] = None
+        self._recent.move_to_end(digest)
+        if len(self._recent) > self._recent_size:
+            self._recent.popitem(last=False)
+
+
+class SeenContent:
+    """ Set of fingerprints of response bodies already scraped.
+
+    Mirror pages and URL aliases that survive URL dedup still deliver
+    byte-identical bodies; fingerprinting the body lets the Engine skip
+    scraping them a second time. Only the 16-byte blake2b digest is
+    kept, not the body itself.
+    """
+
+    def __init__(self):
+        self._digests = set()
+
+    @staticmethod
+    def _digest(body):
+        return blake2b(body, digest_size=16).digest()
+
+    def __contains__(self, body):
+        return self._digest(body) in self._digests
+
+    def add(self, body):
+        self._digests.add(self._digest(body))
@@ -3,8 +3,13 @@
 import uvloop
 import aiohttp
 import asyncio
+import concurrent.futures
 import logging
+import os
+from collections import deque
+from dataclasses import dataclass
 from time import time
+from urllib.parse import urlsplit
 
 from .response import Response
 from .request import Request
@@ -12,17 +17,41 @@ from . import downloadermw
 from . import spidermw
 from . import resultmw
 from . import defaultconfig
+from . import dupefilter
 from . import utils
 from .exceptions import IgnoreRequest
-asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
+@dataclass(slots=True)
+class SpiderSlot:
+    """ A registered spider together with its middleware managers. """
+    spider: object
+    dlmw: downloadermw.DownloaderMiddlewareManager
+    spmw: spidermw.SpiderMiddlewareManager
+    rsmw: resultmw.ResultMiddlewareManager
 
 
 class Engine:
+    # cap on result-pipeline tasks running behind the consumers
+    max_pending_items = 256
+
     def __init__(self, settings=None):
-        self.queue = asyncio.Queue()
-        self.spiders = {}
         self.settings = settings or defaultconfig
-        self.seen_urls = set()
+        maxsize = getattr(self.settings, 'queue_maxsize', None) or 10000
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        # requests that didn't fit in the dispatch queue; consumers pull
+        # from here as slots free up (see _enqueue)
+        self._overflow = deque()
+        self.spiders = {}
+        self._pending = set()
+        self._parse_pool = None
+        # number of enqueued tasks not yet fully distributed; the event
+        # fires when it drops to zero (the crawl frontier is exhausted)
+        self._inflight = 0
+        self._idle = asyncio.Event()
+        self.seen_urls = dupefilter.SeenUrls()
+        self.seen_content = dupefilter.SeenContent()
+        self.content_dedup = getattr(self.settings, 'content_dedup', True)
 
         self.running = False
 
@@ -48,26 +77,31 @@ class Engine:
 
                 for mw in spider.get('spider_middleware', []):
                     mw_obj = utils.load_module_obj(mw)
-                    obj.spiders[spider_obj.name]['spidermwmanager']._add_middleware(mw_obj())
+                    obj.spiders[spider_obj.name].spmw._add_middleware(mw_obj())
 
                 for mw in spider.get('result_middleware', []):
                     mw_obj = utils.load_module_obj(mw)
-                    obj.spiders[spider_obj.name]['resultmwmanager']._add_middleware(mw_obj())
+                    obj.spiders[spider_obj.name].rsmw._add_middleware(mw_obj())
 
         return obj
 
     def start(self):
         self.start_time = time()
         self.running = True
-        self.loop = asyncio.get_event_loop()
-        try:
-            self.loop.run_until_complete(self.work())
-        except KeyboardInterrupt:
-            self.logger.error("User interrupted")
-        self.loop.close()
+        # the uvloop loop is created (and torn down) here rather than by a
+        # module-level policy, so importing arachnid has no side effects
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            self.loop = runner.get_loop()
+            try:
+                runner.run(self.work())
+            except KeyboardInterrupt:
+                self.logger.error("User interrupted")
 
     def stop(self):
         self.unregister_spiders()
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown()
+            self._parse_pool = None
         self.running = False
         self.stop_time = time()
 
@@ -90,55 +124,120 @@ class Engine:
         if spider.name not in self.spiders:
             logger = self.logger.getChild(spider.name)
             spider = spider(logger=logger)
-            self.spiders[spider.name] = {
-                'spider': spider,
-                'downloadmwmanager': downloadermw.DownloaderMiddlewareManager(),
-                'spidermwmanager': spidermw.SpiderMiddlewareManager(),
-                'resultmwmanager': resultmw.ResultMiddlewareManager()
-            }
+            self.spiders[spider.name] = SpiderSlot(
+                spider=spider,
+                dlmw=downloadermw.DownloaderMiddlewareManager(),
+                spmw=spidermw.SpiderMiddlewareManager(),
+                rsmw=resultmw.ResultMiddlewareManager())
         return spider
 
     def unregister_spiders(self):
-        for spider_name, spider in self.spiders.items():
-            self.close_spider(spider['spider'])
+        for spider_name, slot in self.spiders.items():
+            self.close_spider(slot.spider)
 
     def open_spider(self, spider):
-        self.spiders[spider.name]['downloadmwmanager'].open_spider(spider)
-        self.spiders[spider.name]['spidermwmanager'].open_spider(spider)
-        self.spiders[spider.name]['resultmwmanager'].open_spider(spider)
+        slot = self.spiders[spider.name]
+        slot.dlmw.open_spider(spider)
+        slot.spmw.open_spider(spider)
+        slot.rsmw.open_spider(spider)
 
     def close_spider(self, spider):
-        self.spiders[spider.name]['downloadmwmanager'].close_spider(spider)
-        self.spiders[spider.name]['spidermwmanager'].close_spider(spider)
-        self.spiders[spider.name]['resultmwmanager'].close_spider(spider)
+        slot = self.spiders[spider.name]
+        slot.dlmw.close_spider(spider)
+        slot.spmw.close_spider(spider)
+        slot.rsmw.close_spider(spider)
         spider.close_spider(reason='shutdown')
 
+    def _enqueue(self, request):
+        """ Put a request in the task queue unless its URL was seen before.
+
+        Deduplicating here, before the request costs middleware CPU or
+        network, keeps duplicates from ever occupying a queue slot.
+
+        The executers both drain and feed the queue, so this must never
+        block on a full queue -- every executer waiting in put() with
+        nothing draining is a permanent deadlock. Requests that don't
+        fit spill into the unbounded overflow deque, which consumers
+        move back into the queue as slots free up.
+
+        Requests constructed with dont_filter=True (retries and other
+        deliberate re-requests) skip the dedup check.
+        """
+        if not request.dont_filter:
+            url = utils.normalize_url(request.url)
+            if url in self.seen_urls:
+                self.logger.debug("Dropping duplicate request: %s", request.url)
+                return
+            self.seen_urls.add(url)
+        self._inflight += 1
+        if self._overflow:
+            self._overflow.append(request)
+            return
+        try:
+            self.queue.put_nowait(request)
+        except asyncio.QueueFull:
+            self._overflow.append(request)
+
+    async def _warm_connections(self, urls):
+        """ Open one connection per unique seed origin before crawling.
+
+        A HEAD request through the session goes via the connector, so
+        it populates the DNS cache the connector actually consults
+        (ttl_dns_cache) and leaves TLS session state behind for https
+        hosts -- the first real fetches skip both. Runs the warmups in
+        parallel; failures are ignored here and surface on the actual
+        fetch.
+        """
+        async def head(url):
+            async with self._session.head(url):
+                pass
+
+        seen = set()
+        warmups = []
+        for url in urls:
+            parts = urlsplit(url)
+            origin = (parts.scheme, parts.hostname, parts.port)
+            if parts.hostname and origin not in seen:
+                seen.add(origin)
+                warmups.append(head(url))
+        if warmups:
+            await asyncio.gather(*warmups, return_exceptions=True)
+
     async def fetch(self, task, logger, spider):
-        self.seen_urls.add(task.url)
-
-        response = await aiohttp.request('GET', task.url)
-        content_type = response.headers['content-type']
-        response.body = await response.read()
-
-        logger.debug("Got a response: %s (code: %s)", response.url, response.status)
-        response.close()
-        response = Response(response.url,
-                            response.status,
-                            response.headers,
-                            body=response.body,
-                            request=task)
+        async with self._session.get(task.url) as response:
+            # accumulate in chunks instead of one whole-body read(), so a
+            # large page never holds two full copies of itself in memory
+            buf = bytearray()
+            async for chunk in response.content.iter_chunked(65536):
+                buf.extend(chunk)
+            body = bytes(buf)
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Got a response: %s (code: %s)", response.url, response.status)
+            # aiohttp's CIMultiDictProxy doesn't pickle, and a cpu_bound
+            # spider sends the Response across a process boundary
+            response = Response(str(response.url),
+                                response.status,
+                                dict(response.headers),
+                                body=body,
+                                request=task)
         return response
 
-    async def distribute(self, task, logger):
+    async def distribute(self, task, logger, dl_log, sp_log, rs_log):
         spider = task.callback.__self__
-        callback_name = "%s.%s" % (spider.name,
-                                   task.callback.__name__)
-        logger.info("Got a task: %s (callback: %s)", task.url, callback_name)
-        response = await self.spiders[spider.name]['downloadmwmanager'].download(self.fetch, task, logger.getChild('DownloadMW'), spider)
+        slot = self.spiders[spider.name]
+        # the per-task log lines run for every request; skip building
+        # their arguments outright when INFO is not being emitted
+        log_info = logger.isEnabledFor(logging.INFO)
+        if log_info:
+            callback_name = "%s.%s" % (spider.name,
+                                       task.callback.__name__)
+            logger.info("Got a task: %s (callback: %s)", task.url, callback_name)
+        response = await slot.dlmw.download(self.fetch, task, dl_log, spider)
 
         if isinstance(response, Request):
             self.logger.debug("Got a request from downloader, putting in queue")
-            self.queue.put_nowait(response)
+            self._enqueue(response)
             return
         if isinstance(response, IgnoreRequest):
             self.logger.debug("Downloader told us to ignore the request")
@@ -147,20 +246,45 @@ class Engine:
             self.logger.error(response)
             return
 
-        results_iter = await self.spiders[spider.name]['spidermwmanager'].scrape_response(task.callback, response, task, logger.getChild('SpiderMW'), spider)
-        if isinstance(results_iter, Exception):
-            self.logger.error(results_iter)
-            return
+        # mirrors and URL aliases that slip past URL dedup still deliver
+        # identical bodies; don't scrape the same content twice
+        if self.content_dedup and response.body:
+            if response.body in self.seen_content:
+                self.logger.debug("Skipping already-seen content: %s", task.url)
+                return
+            self.seen_content.add(response.body)
 
-        if not self.spiders[spider.name]['resultmwmanager'].methods['process_item']:
+        if not slot.rsmw.methods['process_item']:
             self.logger.warning("You have no result pipeline, results will be discarded")
 
-        self.logger.info("Found %d results (from: %s)", len(results_iter), callback_name)
-        for result in results_iter:
+        num_results = 0
+        executor = self._parse_pool if getattr(spider, 'cpu_bound', False) else None
+        async for result in slot.spmw.scrape_response(task.callback, response, task, sp_log, spider,
+                                                      executor=executor):
+            if isinstance(result, Exception):
+                self.logger.error(result)
+                return
+            num_results += 1
             if isinstance(result, Request):
-                self.queue.put_nowait(result)
+                self._enqueue(result)
             else:
-                res = await self.spiders[spider.name]['resultmwmanager'].process_item(result, logger.getChild('ResultMW'), spider)
+                # run the result pipeline in the background so the
+                # consumer can move on to the next fetch immediately
+                item_task = asyncio.ensure_future(
+                    slot.rsmw.process_item(result, rs_log, spider))
+                self._pending.add(item_task)
+                item_task.add_done_callback(self._item_done)
+                if len(self._pending) > self.max_pending_items:
+                    await asyncio.wait(self._pending,
+                                       return_when=asyncio.FIRST_COMPLETED)
+        if log_info:
+            logger.info("Found %d results (from: %s)", num_results, callback_name)
+
+    def _item_done(self, task):
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error("Result pipeline failed",
+                              exc_info=task.exception())
 
     async def consumer(self, executer_name):
         logger = self.logger.getChild(executer_name)
@@ -168,37 +292,79 @@ class Engine:
             if self.settings.log_level.lower() == 'debug':
                 logger.setLevel(logging.DEBUG)
 
+        # getChild takes the logging manager's lock, so resolve the child
+        # loggers once per executer instead of once per task
+        dl_log = logger.getChild('DownloadMW')
+        sp_log = logger.getChild('SpiderMW')
+        rs_log = logger.getChild('ResultMW')
+
         while True:
             request = await self.queue.get()
+            if request is None:
+                # shutdown sentinel from work()
+                break
+            if self._overflow:
+                # the get() freed a slot; move one spilled request in
+                self.queue.put_nowait(self._overflow.popleft())
             try:
-                await self.distribute(request, logger)
+                await self.distribute(request, logger, dl_log, sp_log, rs_log)
             except (KeyboardInterrupt, MemoryError, SystemExit, asyncio.CancelledError) as e:
                 raise
             except BaseException as e:
                 logger.exception('Task distribution failed')
             finally:
-                self.queue.task_done()
+                # plain counter instead of Queue.task_done/join, which
+                # notifies a condition variable for every single task
+                self._inflight -= 1
+                if self._inflight == 0:
+                    self._idle.set()
 
 
     async def work(self):
+        # one session for the whole crawl, so connections and DNS lookups
+        # are reused across tasks instead of handshaking per request
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100,
+                                           limit_per_host=10,
+                                           ttl_dns_cache=300,
+                                           use_dns_cache=True))
+
+        # spiders whose parse callbacks are cpu-bound get a process pool,
+        # so parsing runs on the other cores while uvloop keeps driving I/O
+        if any(getattr(slot.spider, 'cpu_bound', False)
+               for slot in self.spiders.values()):
+            self._parse_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=os.cpu_count())
+
+        await self._warm_connections(url for slot in self.spiders.values()
+                                     for url in slot.spider.start_urls)
+
         # bootstrap and run executers
-        for spider_name, spider in self.spiders.items():
-            spider_inst = spider['spider']
+        for spider_name, slot in self.spiders.items():
+            spider_inst = slot.spider
             self.open_spider(spider_inst)
             for url in spider_inst.start_urls:
-                await self.queue.put(Request(url, spider_inst.parse))
+                self._enqueue(Request(url, spider_inst.parse))
 
         num_executers = getattr(self.settings, 'engine', {'executers': 3}).get('executers', 3)
 
-        self._workers = [self.loop.create_task(self.consumer('exec' + str(num)))
-                         for num in range(num_executers)]
+        if self._inflight == 0:
+            self._idle.set()
+
+        async with asyncio.TaskGroup() as tg:
+            for num in range(num_executers):
+                tg.create_task(self.consumer('exec' + str(num)))
+            self.logger.info("Started %d executers", num_executers)
+
+            await self._idle.wait()
+            self.logger.info("Closing %d executers", num_executers)
+            for _ in range(num_executers):
+                await self.queue.put(None)
 
-        self.logger.info("Started %d executers", len(self._workers))
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
 
-        await self.queue.join()
-        self.logger.info("Closing %d executers", len(self._workers))
-        for w in self._workers:
-            w.cancel()
+        await self._session.close()
 
         self.logger.info("Closing spiders")
         self.stop()
@@ -1,6 +1,9 @@
 
 
 class Request:
-    def __init__(self, url, callback):
+    def __init__(self, url, callback, dont_filter=False):
         self.url = url
         self.callback = callback
+        # set dont_filter=True to bypass the engine's URL dedup, e.g.
+        # when a middleware re-requests a URL it just failed on
+        self.dont_filter = dont_filter
@@ -1,5 +1,8 @@
 
 class Response:
+    __slots__ = ('_url', 'status', 'headers', '_body', 'request', 'flags',
+                 '_cached_selector')
+
     def __init__(self, url, status=200, headers=None, body=b'', flags=None, request=None):
         self._cached_selector = None
         self.headers = headers or {}
@@ -37,6 +40,17 @@ class Response:
         else:
             self._body = body
 
+    def __getstate__(self):
+        # the lazily-built Selector wraps lxml objects that don't
+        # pickle; drop it and let the other side rebuild on demand
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state['_cached_selector'] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
     @property
     def selector(self):
         from parsel import Selector
@@ -1,11 +1,20 @@
 import asyncio
+import collections.abc
 from . import middleware
 from .request import Request
 from .response import Response
 
+_Iterable = collections.abc.Iterable
+
 
 def _isiterable(maybe_iter):
-    return hasattr(maybe_iter, '__iter__')
+    return isinstance(maybe_iter, _Iterable)
+
+
+def _run_callback(callback, response):
+    # runs inside a worker process; the callback's results have to be
+    # materialized there because generators cannot cross process borders
+    return list(callback(response))
 
 
 class SpiderMiddlewareManager(middleware.MiddlewareManager):
@@ -47,7 +56,20 @@ class SpiderMiddlewareManager(middleware.MiddlewareManager):
         if hasattr(mw, 'process_spider_exception'):
             self.methods['process_spider_exception'].insert(0, mw.process_spider_exception)
 
-    async def scrape_response(self, scrape_func, response, request, logger, spider):
+    async def scrape_response(self, scrape_func, response, request, logger, spider,
+                              executor=None):
+        """ Run the response through the middleware chain and the spider.
+
+        This is an async generator: processed results are yielded one at
+        a time as the spider produces them, so the caller can dispatch
+        each item immediately instead of waiting for a materialized
+        list. If processing fails and no middleware handles the
+        exception, the exception object itself is yielded.
+
+        When ``executor`` is given the spider callback runs there (e.g.
+        a process pool for cpu-bound parsing) instead of on the event
+        loop thread; response and spider must then be picklable.
+        """
         logger.debug("Handling response: {} (code: {}, from: {})".format(response.url, response.status, spider.name))
 
         async def process_spider_input(response):
@@ -56,6 +78,10 @@ class SpiderMiddlewareManager(middleware.MiddlewareManager):
                 assert result is None, \
                     'Middleware {}.process_spider_input must returns None or raise an exception, got {} '.format(
                         method.__class__.__name__, type(result))
+            if executor is not None:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(executor, _run_callback,
+                                                  scrape_func, response)
             return scrape_func(response)
 
         async def process_spider_output(result):
@@ -77,10 +103,13 @@ class SpiderMiddlewareManager(middleware.MiddlewareManager):
                     return result
             return _failure
 
-        results = []
         try:
             for i in await process_spider_input(response):
-                results.append(await process_spider_output(i))
+                yield await process_spider_output(i)
         except Exception as exc:
-            results = await process_spider_exception(exc)
-        return results
+            handled = await process_spider_exception(exc)
+            if handled is exc:
+                yield exc
+            else:
+                for result in handled:
+                    yield result
@@ -1,9 +1,31 @@
 from .spider import Spider
 
+import functools
 import importlib
 import inspect
 import os.path
 import sys
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+@functools.lru_cache(maxsize=65536)
+def normalize_url(url):
+    """ Canonicalize a URL for duplicate detection.
+
+    Lowercases the scheme and host, drops the fragment and sorts the
+    query parameters, so trivially different spellings of the same
+    resource compare equal. Crawls hit the same URLs over and over
+    (every page of a site links back to the same navigation), so the
+    result is memoized to skip re-parsing on repeats.
+    """
+    parts = urlsplit(url)
+    query = parts.query
+    if query:
+        # keep_blank_values, or ?q= and flag-style ?download collapse
+        # into the bare URL and get deduped away as "duplicates"
+        query = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(),
+                       parts.path, query, ''))
 
 
 def load_spider(module, path=None):
@@ -147,6 +147,22 @@ def test_with_exception_handler_iterable(middleware, test_spider, loop):
     assert ret[0]['failed'] == 'ye'
 
 
+def test_with_cpu_bound_middleware(middleware, test_spider, loop):
+    class HeavyMiddleware:
+        cpu_bound = True
+
+        def process_response(self, response, request, spider):
+            response.flags.append('processed-offloop')
+            return response
+
+    middleware._add_middleware(HeavyMiddleware())
+
+    req = Request('http://foo.bar', test_spider.parse)
+    ret_response = loop.run_until_complete(middleware.download(downloader, req, logger, test_spider))
+    assert isinstance(ret_response, Response)
+    assert 'processed-offloop' in ret_response.flags
+
+
 def test_with_open_close_spider(test_spider, loop):
     class RequestManipulator:
         def __init__(self, state):
@@ -0,0 +1,34 @@
+import pytest
+from arachnid.dupefilter import SeenUrls, SeenContent
+
+
+def test_unseen_url_not_contained():
+    seen = SeenUrls()
+    assert 'http://foo.bar' not in seen
+
+
+def test_added_url_is_contained():
+    seen = SeenUrls()
+    seen.add('http://foo.bar')
+    assert 'http://foo.bar' in seen
+
+
+def test_url_survives_recent_eviction():
+    seen = SeenUrls(recent_size=2)
+    seen.add('http://one.url')
+    seen.add('http://two.url')
+    seen.add('http://three.url')
+    # evicted from the exact LRU, but still in the Bloom filter
+    assert 'http://one.url' in seen
+
+
+def test_unseen_content_not_contained():
+    seen = SeenContent()
+    assert b'<html>a body</html>' not in seen
+
+
+def test_added_content_is_contained():
+    seen = SeenContent()
+    seen.add(b'<html>a body</html>')
+    assert b'<html>a body</html>' in seen
+    assert b'<html>another body</html>' not in seen
@@ -1,8 +1,15 @@
 import pytest
+from concurrent.futures import ProcessPoolExecutor
 from arachnid.response import Response
 from parsel import Selector
 
 
+def _scrape(response):
+    # stands in for a cpu_bound spider callback running in a worker process
+    return (response.url, response.status, response.headers,
+            response.xpath('//body/text()').extract_first())
+
+
 def test_response_with_none_str_url():
     with pytest.raises(TypeError) as e_info:
         Response(b'http://www.url.com')
@@ -47,3 +54,19 @@ def test_response_simple_css_selection():
     resp = Response('http://www.url.com', body=body)
     elm = resp.css('body::text').extract_first()
     assert elm == 'my body'
+
+
+def test_response_roundtrips_through_process_pool():
+    body = b'<html><body>my body</body></html>'
+
+    resp = Response('http://www.url.com', 200,
+                    {'content-type': 'text/html'}, body=body)
+    # populate the selector cache; it must not break pickling
+    resp.selector
+
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        url, status, headers, text = pool.submit(_scrape, resp).result()
+    assert url == 'http://www.url.com'
+    assert status == 200
+    assert headers['content-type'] == 'text/html'
+    assert text == 'my body'
@@ -12,6 +12,11 @@ def logger():
     return logging.getLogger('test_logger')
 
 
+async def collect(result_gen):
+    # scrape_response is an async generator, drain it into a list
+    return [result async for result in result_gen]
+
+
 @pytest.fixture
 def test_spider():
     class MyTestSpider(spider.Spider):
@@ -69,7 +74,7 @@ def test_with_process_chain(test_spider, middleware, loop, logger):
     manager = spidermw.SpiderMiddlewareManager(*(middleware,))
 
     result = loop.run_until_complete(
-        manager.scrape_response(test_spider.parse, response, request, logger, test_spider))
+        collect(manager.scrape_response(test_spider.parse, response, request, logger, test_spider)))
     assert result[0]['dummy'] == expected_result['dummy']
 
 
@@ -78,7 +83,7 @@ def test_with_process_chain_failure(test_spider, loop, logger):
         def process_spider_input(self, response, spider):
             raise Exception('processing failed')
         def process_spider_exception(self, response, exception, spider):
-            return 'processing failed'
+            return ['processing failed']
 
     request = Request('http://www.url.com', test_spider.parse)
     response = Response('http://www.url.com', body=b'')
@@ -89,8 +94,8 @@ def test_with_process_chain_failure(test_spider, loop, logger):
     assert middleware.process_spider_exception in manager.methods['process_spider_exception']
 
     processed_result = loop.run_until_complete(
-        manager.scrape_response(test_spider.parse, response, request, logger, test_spider))
-    assert processed_result == expected_exception_value
+        collect(manager.scrape_response(test_spider.parse, response, request, logger, test_spider)))
+    assert processed_result[0] == expected_exception_value
 
 
 def test_with_process_chain_failure_without_handler(test_spider, loop, logger):
@@ -106,7 +111,7 @@ def test_with_process_chain_failure_without_handler(test_spider, loop, logger):
     manager = spidermw.SpiderMiddlewareManager(*(GenericMiddleware(),))
 
     exception = loop.run_until_complete(
-        manager.scrape_response(test_spider.parse, response, request, logger, test_spider))
+        collect(manager.scrape_response(test_spider.parse, response, request, logger, test_spider)))[0]
     assert exception.args[0] == expected_exception_value
 
 
@@ -124,5 +129,5 @@ def test_with_process_chain_failure_returning_none(test_spider, loop, logger):
     manager = spidermw.SpiderMiddlewareManager(*(GenericMiddleware(),))
 
     exception = loop.run_until_complete(
-        manager.scrape_response(test_spider.parse, response, request, logger, test_spider))
+        collect(manager.scrape_response(test_spider.parse, response, request, logger, test_spider)))[0]
     assert exception.args[0] == expected_exception_value
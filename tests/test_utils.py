@@ -0,0 +1,30 @@
+import pytest
+from arachnid import utils
+
+
+def test_normalize_url_lowercases_scheme_and_host():
+    assert utils.normalize_url('HTTP://Foo.BAR/Path') == 'http://foo.bar/Path'
+
+
+def test_normalize_url_strips_fragment():
+    assert utils.normalize_url('http://foo.bar/page#section') == 'http://foo.bar/page'
+
+
+def test_normalize_url_sorts_query_params():
+    assert utils.normalize_url('http://foo.bar/?b=2&a=1') == \
+        utils.normalize_url('http://foo.bar/?a=1&b=2')
+
+
+def test_normalize_url_keeps_path_case():
+    assert utils.normalize_url('http://foo.bar/CaseSensitive') == \
+        'http://foo.bar/CaseSensitive'
+
+
+def test_normalize_url_keeps_blank_query_values():
+    assert utils.normalize_url('http://foo.bar/page?q=') != \
+        utils.normalize_url('http://foo.bar/page')
+
+
+def test_normalize_url_keeps_valueless_query_params():
+    assert utils.normalize_url('http://foo.bar/page?download') != \
+        utils.normalize_url('http://foo.bar/page')